@@ -0,0 +1,335 @@
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, insert
+from sqlmodel import Session, select
+
+from chromadb.errors import ChromaError
+
+from app import shared_state, vectors
+
+# Records per page when reading from, and per bulk insert when writing to, the stores
+TRANSFER_BATCH_SIZE = int(os.getenv("TRANSFER_BATCH_SIZE", "500"))
+SOURCE_PIECE_SIZE = 64 * 1024
+
+
+class TransferError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _history_models():
+    # Conversations are only exportable when history models link them to a chatbot
+    try:
+        from app.models.history_models import Conversation, Message
+    except ImportError:
+        raise TransferError(501, "Conversation history is not available on this node")
+    if not hasattr(Conversation, "chatbot_id"):
+        raise TransferError(400, "Conversations are not linked to chatbots")
+    return Conversation, Message
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record, default=str) + "\n"
+
+
+def _require(record, key: str, kind=dict):
+    if not isinstance(record, dict) or key not in record:
+        raise TransferError(400, f"Record is missing '{key}'")
+    value = record[key]
+    if not isinstance(value, kind):
+        raise TransferError(400, f"Record field '{key}' has the wrong type")
+    return value
+
+
+def export_records(chatbot_id: str, include_conversations: bool = False):
+    """Return an iterator of NDJSON lines: metadata, source text, chunks with vectors, conversations.
+
+    Lookups happen before the first line so errors surface before streaming starts.
+    Bots created before vectors were persisted are embedded once here, so the
+    export always carries their chunks.
+    """
+    try:
+        metadata = shared_state.load_metadata(chatbot_id)
+    except LookupError as e:
+        raise TransferError(404, str(e))
+    models = _history_models() if include_conversations else None
+
+    if not vectors.has_vectors(chatbot_id):
+        source_path = os.path.join(f"chatbots/{chatbot_id}", "source.txt")
+        if not os.path.isfile(source_path):
+            raise TransferError(409, "Chatbot has no stored vectors and no source text to embed")
+        vectors.index_source(chatbot_id, source_path)
+
+    return _export_lines(chatbot_id, metadata, models)
+
+
+def _export_lines(chatbot_id: str, metadata: dict, models):
+    yield _line({"type": "bot", "data": metadata, "conversations": models is not None})
+
+    source_path = os.path.join(f"chatbots/{chatbot_id}", "source.txt")
+    if os.path.isfile(source_path):
+        with open(source_path, "r", encoding="utf-8") as f:
+            while piece := f.read(SOURCE_PIECE_SIZE):
+                yield _line({"type": "source", "text": piece})
+
+    collection = vectors.find_collection(chatbot_id)
+    offset = 0
+    while True:
+        page = collection.get(
+            limit=TRANSFER_BATCH_SIZE,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not page["ids"]:
+            break
+        for i, chunk_id in enumerate(page["ids"]):
+            embedding = page["embeddings"][i]
+            yield _line({
+                "type": "chunk",
+                "id": chunk_id,
+                "text": page["documents"][i],
+                "metadata": page["metadatas"][i],
+                "embedding": [float(x) for x in embedding],
+            })
+        offset += len(page["ids"])
+
+    if models is None:
+        return
+
+    Conversation, Message = models
+    with Session(shared_state.engine) as session:
+        conversations = session.exec(
+            select(Conversation).where(Conversation.chatbot_id == chatbot_id).execution_options(yield_per=TRANSFER_BATCH_SIZE)
+        )
+        for conversation in conversations:
+            yield _line({"type": "conversation", "data": conversation.model_dump()})
+            messages = session.exec(
+                select(Message)
+                .where(Message.conversation_id == conversation.conversation_id)
+                .execution_options(yield_per=TRANSFER_BATCH_SIZE)
+            )
+            for message in messages:
+                yield _line({"type": "message", "data": message.model_dump()})
+
+
+class _Importer:
+    def __init__(self):
+        self.chatbot_id = None
+        self.metadata = None
+        self.collection = None
+        self.chunks = []
+        self.chunk_ids = set()
+        self.dimension = None
+        self.rows = {"bot": 0, "source": 0, "chunk": 0, "conversation": 0, "message": 0}
+        # Time spent in bulk inserts, per target store
+        self.seconds = {"chunk": 0.0, "conversation": 0.0, "message": 0.0}
+        self.pending = {"conversation": [], "message": []}
+
+    def bot(self, record):
+        if self.chatbot_id is not None:
+            raise TransferError(400, "Stream contains more than one chatbot")
+        metadata = _require(record, "data")
+        try:
+            # Canonical UUID form; also keeps the id from escaping chatbots/
+            chatbot_id = str(uuid.UUID(_require(metadata, "id", str)))
+        except ValueError:
+            raise TransferError(400, "Chatbot id must be a UUID")
+        metadata["id"] = chatbot_id
+        if record.get("conversations"):
+            # Check history support before anything is written
+            _history_models()
+        chatbot_dir = f"chatbots/{chatbot_id}"
+        existing = shared_state.get_bot(chatbot_id)
+        retry = existing is not None and existing["ingestion_status"] == "failed"
+        if not retry and (existing is not None or os.path.exists(chatbot_dir)):
+            raise TransferError(409, "Chatbot already exists")
+
+        os.makedirs(chatbot_dir, exist_ok=retry)
+        if retry:
+            # Discard chunks left behind by the failed attempt
+            try:
+                vectors.get_client().delete_collection(vectors.collection_name(chatbot_id))
+            except ValueError:
+                pass
+        metadata["index_file"] = os.path.join(chatbot_dir, "source.txt")
+        self.chatbot_id = chatbot_id
+        self.metadata = metadata
+        self.collection = vectors.get_or_create_collection(chatbot_id)
+        open(metadata["index_file"], "w", encoding="utf-8").close()
+        shared_state.set_ingestion_status(chatbot_id, "importing")
+
+    def source(self, record):
+        with open(self.metadata["index_file"], "a", encoding="utf-8") as f:
+            f.write(_require(record, "text", str))
+
+    def chunk(self, record):
+        chunk_id = _require(record, "id", str)
+        _require(record, "text", str)
+        embedding = _require(record, "embedding", list)
+        metadata = record.get("metadata")
+        if metadata is not None and not isinstance(metadata, dict):
+            raise TransferError(400, "Record field 'metadata' has the wrong type")
+        if not embedding or not all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in embedding):
+            raise TransferError(400, f"Chunk {chunk_id} has a non-numeric embedding")
+        if self.dimension is None:
+            self.dimension = len(embedding)
+        elif len(embedding) != self.dimension:
+            raise TransferError(400, f"Chunk {chunk_id} has dimension {len(embedding)}, expected {self.dimension}")
+        if chunk_id in self.chunk_ids:
+            raise TransferError(400, f"Duplicate chunk id: {chunk_id}")
+        self.chunk_ids.add(chunk_id)
+        self.chunks.append(record)
+        if len(self.chunks) >= TRANSFER_BATCH_SIZE:
+            self.flush_chunks()
+
+    def flush_chunks(self):
+        if not self.chunks:
+            return
+        start = time.perf_counter()
+        try:
+            self.collection.add(
+                ids=[c["id"] for c in self.chunks],
+                embeddings=[c["embedding"] for c in self.chunks],
+                documents=[c["text"] for c in self.chunks],
+                # Chroma rejects empty dicts but accepts None per chunk
+                metadatas=[c.get("metadata") or None for c in self.chunks],
+            )
+        except (ValueError, ChromaError) as e:
+            raise TransferError(400, f"Invalid chunk batch: {e}")
+        self.seconds["chunk"] += time.perf_counter() - start
+        self.chunks = []
+        # Ids only need to be unique within a batch; repeats across batches are ignored
+        self.chunk_ids = set()
+
+    def row(self, kind, record):
+        if self.rows[kind] == 0:
+            # Fail on the first history record rather than at flush time
+            _history_models()
+        self.pending[kind].append(_require(record, "data"))
+        if len(self.pending[kind]) >= TRANSFER_BATCH_SIZE:
+            self.flush_rows(kind)
+
+    def flush_rows(self, kind):
+        rows = self.pending[kind]
+        if not rows:
+            return
+        if kind == "message":
+            # Parents first so messages never reference a missing conversation
+            self.flush_rows("conversation")
+        Conversation, Message = _history_models()
+        model = Conversation if kind == "conversation" else Message
+        for column in model.__table__.columns:
+            if isinstance(column.type, DateTime):
+                for row in rows:
+                    if isinstance(row.get(column.name), str):
+                        row[column.name] = datetime.fromisoformat(row[column.name])
+        start = time.perf_counter()
+        with Session(shared_state.engine) as session:
+            session.execute(insert(model.__table__), rows)
+            session.commit()
+        self.seconds[kind] += time.perf_counter() - start
+        self.pending[kind] = []
+
+    def finish(self):
+        self.flush_chunks()
+        self.flush_rows("message")
+        self.flush_rows("conversation")
+        with open(os.path.join(f"chatbots/{self.chatbot_id}", "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(self.metadata, f)
+        shared_state.register_bot(self.chatbot_id, self.metadata)
+
+    def report(self, elapsed: float):
+        rows_per_second = {}
+        for kind, seconds in self.seconds.items():
+            count = self.rows[kind]
+            rows_per_second[kind] = round(count / seconds, 1) if count and seconds else 0.0
+        return {
+            "chatbot_id": self.chatbot_id,
+            "rows": self.rows,
+            "rows_per_second": rows_per_second,
+            "elapsed_seconds": round(elapsed, 3),
+        }
+
+
+def import_records(lines):
+    """Import a bot from NDJSON lines using bulk inserts; vectors are stored as-is."""
+    importer = _Importer()
+    start = time.perf_counter()
+    try:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = _require(record, "type", str)
+            if kind not in importer.rows:
+                raise TransferError(400, f"Unknown record type: {kind}")
+            if kind != "bot" and importer.chatbot_id is None:
+                raise TransferError(400, "Stream must start with a bot record")
+
+            if kind == "bot":
+                importer.bot(record)
+            elif kind == "source":
+                importer.source(record)
+            elif kind == "chunk":
+                importer.chunk(record)
+            else:
+                importer.row(kind, record)
+            importer.rows[kind] += 1
+
+        if importer.chatbot_id is None:
+            raise TransferError(400, "Stream does not contain a chatbot")
+        importer.finish()
+    except Exception as e:
+        if importer.chatbot_id is not None:
+            shared_state.set_ingestion_status(importer.chatbot_id, "failed")
+        if isinstance(e, json.JSONDecodeError):
+            raise TransferError(400, f"Invalid NDJSON line: {e}")
+        raise
+
+    return importer.report(time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="botio", description="Export and import chatbots as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write a chatbot to NDJSON")
+    export_parser.add_argument("chatbot_id")
+    export_parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    export_parser.add_argument("--conversations", action="store_true", help="Include conversations")
+
+    import_parser = commands.add_parser("import", help="Load a chatbot from NDJSON")
+    import_parser.add_argument("input", help="Input file, or - for stdin")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "export":
+            out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+            try:
+                for line in export_records(args.chatbot_id, args.conversations):
+                    out.write(line)
+            finally:
+                if args.output:
+                    out.close()
+        else:
+            if args.input == "-":
+                report = import_records(sys.stdin)
+            else:
+                with open(args.input, "r", encoding="utf-8") as f:
+                    report = import_records(f)
+            print(json.dumps(report, indent=2))
+    except TransferError as e:
+        print(f"Error: {e.detail}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -43,6 +43,7 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from app.routes import  chat
+from app import rerank, shared_state
 from dotenv import load_dotenv
 import os
 
@@ -123,6 +124,18 @@ def login(username: str, password: str, session: Session = Depends(get_session))
 app.include_router(chat.ai_router)
 
 
+@app.on_event("startup")
+def start_shared_state_listener():
+    shared_state.start_listener()
+
+
+@app.on_event("startup")
+def preload_rerank_model():
+    # Load the cross-encoder up front so no request pays for it
+    if any(chatbot.get("rerank") for chatbot in shared_state.list_bots()):
+        rerank.preload()
+
+
 def start():
     import uvicorn
     uvicorn.run("app.main:app", host="127.0.0.1", port=8080, reload=True)
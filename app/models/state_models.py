@@ -0,0 +1,24 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+from typing import Optional
+
+
+class BotRegistry(SQLModel, table=True):
+    bot_id: str = Field(primary_key=True)
+    version: int = 0
+    metadata_json: str = "{}"
+    ingestion_status: str = "unknown"
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ResponseCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True)
+    bot_id: str = Field(index=True)
+    response: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class InvalidationEvent(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    bot_id: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
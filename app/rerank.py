@@ -0,0 +1,175 @@
+import os
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rerank settings (per-bot values in metadata.json override the latency cap)
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "3"))
+RERANK_MAX_MS = float(os.getenv("RERANK_MAX_MS", "300"))
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "2"))
+
+RERANK_REMEASURE_EVERY = int(os.getenv("RERANK_REMEASURE_EVERY", "20"))
+
+_model = None
+_model_lock = threading.Lock()
+_loader = None
+_loader_lock = threading.Lock()
+# Serialises forward passes so concurrent requests never exceed RERANK_THREADS
+_predict_lock = threading.Lock()
+# Moving average of CPU cost per (query, chunk) pair, used to predict latency
+_ms_per_pair = None
+# Calls skipped on the estimate since the last measured pass
+_skipped = 0
+
+
+def get_cross_encoder():
+    global _model, _ms_per_pair
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import torch
+                from sentence_transformers import CrossEncoder
+
+                torch.set_num_threads(RERANK_THREADS)
+                model = CrossEncoder(RERANK_MODEL, device="cpu")
+                # The first pass is the slow one; time a second to seed the estimate,
+                # so the latency cap applies from the first request
+                warm_up = [("warm up", "warm up")] * RERANK_CANDIDATES
+                model.predict(warm_up, batch_size=len(warm_up), show_progress_bar=False)
+                start = time.perf_counter()
+                model.predict(warm_up, batch_size=len(warm_up), show_progress_bar=False)
+                _ms_per_pair = (time.perf_counter() - start) * 1000 / len(warm_up)
+                _model = model
+    return _model
+
+
+def _background_load():
+    global _loader
+    try:
+        get_cross_encoder()
+    except Exception as e:
+        print(f"Rerank model load failed: {e}")
+    finally:
+        with _loader_lock:
+            _loader = None
+
+
+def preload():
+    """Load and warm the model in a background thread, never inside a request."""
+    global _loader
+    with _loader_lock:
+        if _model is not None or _loader is not None:
+            return
+        _loader = threading.Thread(target=_background_load, name="rerank-loader", daemon=True)
+        _loader.start()
+
+
+def estimate_ms(num_pairs: int):
+    if _ms_per_pair is None:
+        return None
+    return _ms_per_pair * num_pairs
+
+
+def rerank(query: str, docs: list, top_k: int = RERANK_TOP_K, max_ms: float = RERANK_MAX_MS):
+    """Return (docs, reranked) keeping the top_k chunks by cross-encoder score.
+
+    Falls back to the first-stage order while the model is still loading, when
+    the predicted forward pass would not fit in max_ms, or when waiting for
+    another request's pass would use up the budget.
+    """
+    global _ms_per_pair, _skipped
+    if len(docs) <= top_k:
+        return docs, False
+    if max_ms <= 0:
+        return docs[:top_k], False
+    if _model is None:
+        preload()
+        return docs[:top_k], False
+
+    predicted = estimate_ms(len(docs))
+    if predicted is not None and predicted > max_ms:
+        _skipped += 1
+        # Re-measure now and then so one slow pass cannot disable reranking for good
+        if _skipped < RERANK_REMEASURE_EVERY:
+            return docs[:top_k], False
+    _skipped = 0
+
+    wait_ms = max(max_ms - (predicted or 0), 0)
+    if not _predict_lock.acquire(timeout=min(wait_ms / 1000, threading.TIMEOUT_MAX)):
+        return docs[:top_k], False
+    try:
+        pairs = [(query, doc.page_content) for doc in docs]
+        start = time.perf_counter()
+        scores = _model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    finally:
+        _predict_lock.release()
+
+    per_pair = elapsed_ms / len(pairs)
+    _ms_per_pair = per_pair if _ms_per_pair is None else 0.8 * _ms_per_pair + 0.2 * per_pair
+
+    ranked = sorted(zip(scores, range(len(docs))), key=lambda item: item[0], reverse=True)
+    return [docs[i] for _, i in ranked[:top_k]], True
+
+
+# Chunks the non-rerank ask path puts in the prompt (LangChain's default retriever k)
+DEFAULT_RETRIEVER_K = 4
+
+
+def approx_tokens(text: str) -> int:
+    # Roughly 4 characters per token for Gemini on English text
+    return max(1, len(text) // 4)
+
+
+def benchmark(source_path: str, question: str, rounds: int = 5):
+    """Compare prompt tokens saved by reranking against the CPU time it adds."""
+    from langchain_community.document_loaders import TextLoader
+    from langchain.text_splitter import CharacterTextSplitter
+
+    documents = TextLoader(source_path).load()
+    chunks = CharacterTextSplitter(chunk_size=500, chunk_overlap=100).split_documents(documents)
+
+    # Stand-in first stage: keyword overlap, so the benchmark needs no embedding API
+    terms = set(question.lower().split())
+    chunks.sort(key=lambda doc: len(terms & set(doc.page_content.lower().split())), reverse=True)
+    candidates = chunks[:RERANK_CANDIDATES]
+
+    start = time.perf_counter()
+    get_cross_encoder()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        kept, _ = rerank(question, candidates, max_ms=float("inf"))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    default_tokens = sum(approx_tokens(doc.page_content) for doc in candidates[:DEFAULT_RETRIEVER_K])
+    candidate_tokens = sum(approx_tokens(doc.page_content) for doc in candidates)
+    rerank_tokens = sum(approx_tokens(doc.page_content) for doc in kept)
+    timings.sort()
+
+    print(f"chunks: {len(chunks)}  candidates: {len(candidates)}  kept: {len(kept)}")
+    print(f"model load: {load_ms:.0f} ms  (threads={RERANK_THREADS})")
+    print(f"rerank cpu: median {timings[len(timings) // 2]:.1f} ms, max {timings[-1]:.1f} ms")
+    print(
+        f"prompt tokens vs default path (k={DEFAULT_RETRIEVER_K}): "
+        f"{default_tokens} -> {rerank_tokens} (saved {default_tokens - rerank_tokens})"
+    )
+    print(
+        f"prompt tokens vs all {len(candidates)} candidates: "
+        f"{candidate_tokens} -> {rerank_tokens} (saved {candidate_tokens - rerank_tokens})"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python -m app.rerank <source.txt> <question>")
+        sys.exit(1)
+    benchmark(sys.argv[1], " ".join(sys.argv[2:]))
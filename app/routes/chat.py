@@ -1,17 +1,19 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, APIRouter , Depends
-from langchain_community.document_loaders import TextLoader
-from langchain.indexes import VectorstoreIndexCreator
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from langchain.indexes.vectorstore import VectorStoreIndexWrapper
+from langchain_google_genai import GoogleGenerativeAI
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.prompts import PromptTemplate
 from uuid import uuid4
+import io
 import os
 import json  # Missing import for JSON operations
 # from tempfile import NamedTemporaryFile
 from dotenv import load_dotenv
 from sqlmodel import Field, SQLModel, Session, create_engine
 from typing import Optional
+from app import bot_transfer, rerank, shared_state, vectors
 
 load_dotenv()
 
@@ -65,12 +67,31 @@ def create_prompt(persona_settings, user_query):
         user_query=user_query,
     )
 
+# Prompt that stuffs the reranked chunks as context
+def create_context_prompt(prompt, docs):
+    context = "\n\n".join(doc.page_content for doc in docs)
+    return f"""Use the following pieces of context to answer the question at the end.
+If you don't know the answer, just say that you don't know.
+
+{context}
+
+Question: {prompt}
+Helpful Answer:"""
+
+# Load chatbot metadata from the shared registry, falling back to disk
+def load_chatbot_metadata(chatbot_id: str):
+    try:
+        return shared_state.load_metadata(chatbot_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 # AI Router
 ai_router = APIRouter(prefix="/ai")
 
 @ai_router.post("/upload_file/{name}/{description}/{tone}/{personality}")
-async def upload_file(name: str, description: str, tone: str, personality: str, file: UploadFile = File(...)):
+async def upload_file(name: str, description: str, tone: str, personality: str, file: UploadFile = File(...), rerank_enabled: bool = False):
     chatbot_id = str(uuid4())
+    shared_state.set_ingestion_status(chatbot_id, "indexing")
 
     try:
         # Save the uploaded file
@@ -84,15 +105,8 @@ async def upload_file(name: str, description: str, tone: str, personality: str,
         with open(temp_file_path, "w", encoding="utf-8") as temp_file:
             temp_file.write(text)
 
-        loader = TextLoader(temp_file_path)
-        embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-        index_creator = VectorstoreIndexCreator(embedding=embedding, text_splitter=text_splitter)
-        index = index_creator.from_loaders([loader])
-        embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-        index_creator = VectorstoreIndexCreator(embedding=embedding, text_splitter=text_splitter)
-        index = index_creator.from_loaders([loader])
+        # Embed once into the bot's persistent collection
+        vectors.index_source(chatbot_id, temp_file_path)
 
         # Save chatbot metadata
         metadata = {
@@ -102,29 +116,21 @@ async def upload_file(name: str, description: str, tone: str, personality: str,
             "tone": tone,
             "personality": personality,
             "index_file": temp_file_path,
+            "rerank": rerank_enabled,
         }
         with open(os.path.join(chatbot_dir, "metadata.json"), "w", encoding="utf-8") as metadata_file:
             json.dump(metadata, metadata_file)
+        shared_state.register_bot(chatbot_id, metadata)
 
         return {"message": "Chatbot created successfully", "chatbot_id": chatbot_id}
 
     except Exception as e:
+        shared_state.set_ingestion_status(chatbot_id, "failed")
         raise HTTPException(status_code=500, detail=f"Error processing the uploaded file: {str(e)}")
 
 @ai_router.post("/ask/{chatbot_id}")
 async def ask_question(chatbot_id: str, question: str):
-    chatbot_dir = f"chatbots/{chatbot_id}"
-
-    if not os.path.exists(chatbot_dir):
-        raise HTTPException(status_code=404, detail="Chatbot not found")
-
-    # Load chatbot metadata
-    metadata_file = os.path.join(chatbot_dir, "metadata.json")
-    if not os.path.isfile(metadata_file):
-        raise HTTPException(status_code=404, detail="Metadata not found")
-
-    with open(metadata_file, "r", encoding="utf-8") as f:
-        chatbot_metadata = json.load(f)
+    chatbot_metadata = load_chatbot_metadata(chatbot_id)
 
     # Create a persona-based prompt
     persona_settings = {
@@ -135,35 +141,103 @@ async def ask_question(chatbot_id: str, question: str):
     }
     prompt = create_prompt(persona_settings, question)
 
-    # Reload the index
-    index_file_path = chatbot_metadata["index_file"]
-    loader = TextLoader(index_file_path)
-    embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    index_creator = VectorstoreIndexCreator(embedding=embedding, text_splitter=text_splitter)
-    index = index_creator.from_loaders([loader])
-
-    # Query the index
-    response = index.query(prompt, llm=llm, memory=memory)
+    # Memory is only recorded, never put into the prompt, so an answer depends on
+    # (bot, version, question) alone and is safe to share; hits still go to memory
+    cached_response = shared_state.get_cached_response(chatbot_id, question)
+    if cached_response is not None:
+        memory.save_context({"query": prompt}, {"result": cached_response})
+        return {"response": cached_response}
+
+    # Use the stored vectors; bots created before they were persisted are embedded once here
+    embedding = vectors.get_embedding()
+    if vectors.has_vectors(chatbot_id):
+        vectorstore = vectors.get_vectorstore(chatbot_id, embedding)
+    else:
+        vectorstore = vectors.index_source(chatbot_id, chatbot_metadata["index_file"], embedding)
+    index = VectorStoreIndexWrapper(vectorstore=vectorstore)
+
+    # Query the index, optionally reranking a wider candidate set locally
+    if chatbot_metadata.get("rerank", False):
+        candidates = index.vectorstore.similarity_search(question, k=rerank.RERANK_CANDIDATES)
+        max_ms = chatbot_metadata.get("rerank_max_ms", rerank.RERANK_MAX_MS)
+        docs, _ = await run_in_threadpool(rerank.rerank, question, candidates, max_ms=max_ms)
+        response = llm.invoke(create_context_prompt(prompt, docs))
+        memory.save_context({"query": prompt}, {"result": response})
+    else:
+        response = index.query(prompt, llm=llm, memory=memory)
+
+    shared_state.put_cached_response(chatbot_id, question, response)
     return {"response": response}
 
+# Endpoint to toggle reranking for a chatbot
+@ai_router.patch("/chatbots/{chatbot_id}/rerank")
+async def set_rerank(chatbot_id: str, enabled: bool, max_ms: Optional[float] = None):
+    chatbot_metadata = load_chatbot_metadata(chatbot_id)
+    metadata_file = os.path.join(f"chatbots/{chatbot_id}", "metadata.json")
+
+    chatbot_metadata["rerank"] = enabled
+    if enabled:
+        rerank.preload()
+    if max_ms is not None:
+        chatbot_metadata["rerank_max_ms"] = max_ms
+
+    if os.path.isdir(os.path.dirname(metadata_file)):
+        with open(metadata_file, "w", encoding="utf-8") as f:
+            json.dump(chatbot_metadata, f)
+    shared_state.register_bot(chatbot_id, chatbot_metadata)
+
+    return {"message": "Rerank settings updated", "chatbot_id": chatbot_id, "rerank": enabled}
+
 # Endpoint to get a list of all chatbots
 @ai_router.get("/chatbots")
 async def get_all_chatbots():
     chatbots_dir = "chatbots"
-    chatbots_list = []
+    chatbots_list = shared_state.list_bots()
+    registered = {chatbot["id"] for chatbot in chatbots_list}
 
     if not os.path.exists(chatbots_dir):
-        return {"chatbots": []}
+        return {"chatbots": chatbots_list}
 
+    # Include bots created before the shared registry existed
     for chatbot_id in os.listdir(chatbots_dir):
         metadata_file = os.path.join(chatbots_dir, chatbot_id, "metadata.json")
-        if os.path.isfile(metadata_file):
+        if chatbot_id not in registered and os.path.isfile(metadata_file):
             with open(metadata_file, "r", encoding="utf-8") as f:
                 chatbots_list.append(json.load(f))
 
     return {"chatbots": chatbots_list}
 
+@ai_router.get("/chatbots/{chatbot_id}/status")
+async def get_chatbot_status(chatbot_id: str):
+    bot = shared_state.get_bot(chatbot_id)
+    if bot is None:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    return {"chatbot_id": chatbot_id, "version": bot["version"], "ingestion_status": bot["ingestion_status"]}
+
+# Stream a chatbot with its chunks and vectors as NDJSON
+@ai_router.get("/chatbots/{chatbot_id}/export")
+async def export_chatbot(chatbot_id: str, include_conversations: bool = False):
+    try:
+        # May embed a legacy bot's source, so keep it off the event loop
+        lines = await run_in_threadpool(bot_transfer.export_records, chatbot_id, include_conversations)
+    except bot_transfer.TransferError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return StreamingResponse(
+        lines,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{chatbot_id}.ndjson"'},
+    )
+
+# Import a chatbot from an NDJSON export without re-embedding
+@ai_router.post("/chatbots/import")
+async def import_chatbot(file: UploadFile = File(...)):
+    lines = io.TextIOWrapper(file.file, encoding="utf-8")
+    try:
+        report = await run_in_threadpool(bot_transfer.import_records, lines)
+    except bot_transfer.TransferError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"message": "Chatbot imported successfully", **report}
+
 @ai_router.get("/chatboards")
 async def get_all_chatboards(session: Session = Depends(get_session)):
         chatboards = session.query(Chatbot).all()
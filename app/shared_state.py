@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import select as io_select
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, text
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app.models.state_models import BotRegistry, ResponseCacheEntry, InvalidationEvent
+
+load_dotenv()
+
+# State shared by every uvicorn worker; defaults to the app database
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", os.getenv("DATABASE_URL", "sqlite:///./test.db"))
+SHARED_STATE_POLL_SECONDS = float(os.getenv("SHARED_STATE_POLL_SECONDS", "0.5"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_LOCAL_SIZE = int(os.getenv("RESPONSE_CACHE_LOCAL_SIZE", "1000"))
+# Upper bound on how long a worker trusts its cached copy of a bot
+BOT_CACHE_TTL_SECONDS = float(os.getenv("BOT_CACHE_TTL_SECONDS", "60"))
+# Events are re-read for this long, so ones that commit out of id order are not missed
+EVENT_RESCAN_SECONDS = int(os.getenv("EVENT_RESCAN_SECONDS", "30"))
+NOTIFY_CHANNEL = "bot_state"
+
+engine = create_engine(SHARED_STATE_URL)
+SQLModel.metadata.create_all(
+    engine,
+    tables=[BotRegistry.__table__, ResponseCacheEntry.__table__, InvalidationEvent.__table__],
+)
+_is_postgres = engine.dialect.name == "postgresql"
+
+# Per-process caches, dropped when another worker broadcasts an invalidation
+_lock = threading.Lock()
+_bots = {}
+# Bumped on every drop, so a read that raced with one is not cached
+_generations = {}
+_responses = OrderedDict()
+_applied_events = set()
+_listener = None
+
+
+def _drop(bot_id: str):
+    with _lock:
+        _generations[bot_id] = _generations.get(bot_id, 0) + 1
+        _bots.pop(bot_id, None)
+        for key in [k for k, (owner, _) in _responses.items() if owner == bot_id]:
+            del _responses[key]
+
+
+def _emit(session: Session, bot_id: str):
+    session.add(InvalidationEvent(bot_id=bot_id))
+    if _is_postgres:
+        session.execute(text("SELECT pg_notify(:channel, :bot_id)"), {"channel": NOTIFY_CHANNEL, "bot_id": bot_id})
+
+
+def _to_dict(row: BotRegistry):
+    return {
+        "version": row.version,
+        "metadata": json.loads(row.metadata_json),
+        "ingestion_status": row.ingestion_status,
+    }
+
+
+def _upsert(bot_id: str, metadata: dict | None = None, status: str | None = None, bump: bool = False):
+    with Session(engine) as session:
+        row = session.exec(select(BotRegistry).where(BotRegistry.bot_id == bot_id).with_for_update()).first()
+        if row is None:
+            row = BotRegistry(bot_id=bot_id)
+        if metadata is not None:
+            row.metadata_json = json.dumps(metadata)
+        if status is not None:
+            row.ingestion_status = status
+        if bump:
+            row.version += 1
+            # Entries are keyed by version, so every existing one is now unreachable
+            session.execute(delete(ResponseCacheEntry).where(ResponseCacheEntry.bot_id == bot_id))
+        row.updated_at = datetime.utcnow()
+        session.add(row)
+        _emit(session, bot_id)
+        session.commit()
+        session.refresh(row)
+        result = _to_dict(row)
+    _drop(bot_id)
+    return result
+
+
+def register_bot(bot_id: str, metadata: dict, status: str = "ready"):
+    """Publish new or updated bot metadata and bump its registry version."""
+    return _upsert(bot_id, metadata=metadata, status=status, bump=True)
+
+
+def set_ingestion_status(bot_id: str, status: str):
+    return _upsert(bot_id, status=status)
+
+
+def get_bot(bot_id: str):
+    with _lock:
+        cached = _bots.get(bot_id)
+        generation = _generations.get(bot_id, 0)
+    if cached is not None and time.monotonic() - cached[1] < BOT_CACHE_TTL_SECONDS:
+        return cached[0]
+
+    with Session(engine) as session:
+        row = session.get(BotRegistry, bot_id)
+        if row is None:
+            return None
+        result = _to_dict(row)
+
+    with _lock:
+        if _generations.get(bot_id, 0) == generation:
+            _bots[bot_id] = (result, time.monotonic())
+    return result
+
+
+def load_metadata(chatbot_id: str):
+    """Return bot metadata from the registry, falling back to chatbots/ on disk.
+
+    Raises LookupError when the bot or its metadata file does not exist.
+    """
+    bot = get_bot(chatbot_id)
+    if bot is not None and bot["metadata"]:
+        return bot["metadata"]
+
+    chatbot_dir = f"chatbots/{chatbot_id}"
+    if not os.path.exists(chatbot_dir):
+        raise LookupError("Chatbot not found")
+
+    metadata_file = os.path.join(chatbot_dir, "metadata.json")
+    if not os.path.isfile(metadata_file):
+        raise LookupError("Metadata not found")
+
+    with open(metadata_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_bots():
+    with Session(engine) as session:
+        rows = session.exec(select(BotRegistry)).all()
+        return [json.loads(row.metadata_json) for row in rows if row.metadata_json != "{}"]
+
+
+def _cache_key(bot_id: str, version: int, question: str):
+    return hashlib.sha256(f"{bot_id}:{version}:{question}".encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, bot_id: str, response: str):
+    with _lock:
+        _responses[key] = (bot_id, response)
+        _responses.move_to_end(key)
+        while len(_responses) > RESPONSE_CACHE_LOCAL_SIZE:
+            _responses.popitem(last=False)
+
+
+def get_cached_response(bot_id: str, question: str):
+    bot = get_bot(bot_id)
+    if bot is None:
+        return None
+    key = _cache_key(bot_id, bot["version"], question)
+
+    with _lock:
+        cached = _responses.get(key)
+        if cached is not None:
+            _responses.move_to_end(key)
+    if cached is not None:
+        return cached[1]
+
+    with Session(engine) as session:
+        entry = session.get(ResponseCacheEntry, key)
+        if entry is None:
+            return None
+        response = entry.response
+
+    _remember(key, bot_id, response)
+    return response
+
+
+def put_cached_response(bot_id: str, question: str, response: str):
+    bot = get_bot(bot_id)
+    if bot is None:
+        return
+    key = _cache_key(bot_id, bot["version"], question)
+
+    with Session(engine) as session:
+        session.merge(ResponseCacheEntry(key=key, bot_id=bot_id, response=response))
+        session.commit()
+
+    _remember(key, bot_id, response)
+
+
+def _apply_events():
+    global _applied_events
+    cutoff = datetime.utcnow() - timedelta(seconds=EVENT_RESCAN_SECONDS)
+    with Session(engine) as session:
+        events = session.exec(select(InvalidationEvent).where(InvalidationEvent.created_at >= cutoff)).all()
+    seen = set()
+    for event in events:
+        seen.add(event.id)
+        if event.id not in _applied_events:
+            _drop(event.bot_id)
+    _applied_events = seen
+
+
+def _prune():
+    # Workers only re-read events from the last EVENT_RESCAN_SECONDS
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        session.execute(delete(InvalidationEvent).where(InvalidationEvent.created_at < now - timedelta(minutes=10)))
+        session.execute(
+            delete(ResponseCacheEntry).where(
+                ResponseCacheEntry.created_at < now - timedelta(seconds=RESPONSE_CACHE_TTL_SECONDS)
+            )
+        )
+        session.commit()
+
+
+def _open_listen_connection():
+    connection = engine.raw_connection()
+    connection.driver_connection.autocommit = True
+    connection.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+    return connection
+
+
+def _listen():
+    connection = None
+    last_prune = time.monotonic()
+    while True:
+        try:
+            if _is_postgres and connection is None:
+                connection = _open_listen_connection()
+                # Catch up on anything sent while the connection was down
+                _apply_events()
+            if connection is not None:
+                # Wake on NOTIFY, fall back to a poll if a message is missed
+                pg = connection.driver_connection
+                io_select.select([pg], [], [], SHARED_STATE_POLL_SECONDS)
+                pg.poll()
+                pg.notifies.clear()
+            else:
+                time.sleep(SHARED_STATE_POLL_SECONDS)
+            _apply_events()
+            if time.monotonic() - last_prune > 60:
+                _prune()
+                last_prune = time.monotonic()
+        except Exception as e:
+            print(f"Shared state listener error: {e}")
+            if connection is not None:
+                # Drop the LISTEN connection; it is re-opened on the next pass
+                try:
+                    connection.invalidate()
+                except Exception:
+                    pass
+                connection = None
+            time.sleep(SHARED_STATE_POLL_SECONDS)
+
+
+def start_listener():
+    """Start the background thread that applies invalidations from other workers."""
+    global _listener
+    if _listener is not None:
+        return
+    _listener = threading.Thread(target=_listen, name="shared-state-listener", daemon=True)
+    _listener.start()
+
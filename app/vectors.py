@@ -0,0 +1,64 @@
+import os
+
+import chromadb
+from chromadb.errors import ChromaError
+from dotenv import load_dotenv
+from langchain_community.document_loaders import TextLoader
+from langchain.text_splitter import CharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+load_dotenv()
+
+# Persistent vector store so chunks are embedded once, at ingestion
+CHROMA_DIR = os.getenv("CHROMA_DIR", "chroma")
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = chromadb.PersistentClient(path=CHROMA_DIR)
+    return _client
+
+
+def get_embedding():
+    return GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+
+
+def collection_name(chatbot_id: str) -> str:
+    return f"bot-{chatbot_id}"
+
+
+def find_collection(chatbot_id: str):
+    """Return the bot's collection, or None; never creates one."""
+    try:
+        return get_client().get_collection(collection_name(chatbot_id))
+    except (ValueError, ChromaError):
+        return None
+
+
+def get_or_create_collection(chatbot_id: str):
+    return get_client().get_or_create_collection(collection_name(chatbot_id))
+
+
+def has_vectors(chatbot_id: str) -> bool:
+    collection = find_collection(chatbot_id)
+    return collection is not None and collection.count() > 0
+
+
+def get_vectorstore(chatbot_id: str, embedding):
+    return Chroma(client=get_client(), collection_name=collection_name(chatbot_id), embedding_function=embedding)
+
+
+def index_source(chatbot_id: str, source_path: str, embedding=None):
+    """Embed a bot's source text into its collection and return the vector store."""
+    embedding = embedding or get_embedding()
+    documents = TextLoader(source_path).load()
+    chunks = CharacterTextSplitter(chunk_size=500, chunk_overlap=100).split_documents(documents)
+    vectorstore = get_vectorstore(chatbot_id, embedding)
+    if chunks:
+        # Stable ids make a repeated or concurrent backfill a no-op instead of duplicating chunks
+        vectorstore.add_documents(chunks, ids=[f"{chatbot_id}-{i}" for i in range(len(chunks))])
+    return vectorstore
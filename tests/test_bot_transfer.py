@@ -0,0 +1,153 @@
+import importlib
+import json
+import os
+import shutil
+from uuid import uuid4
+
+import chromadb
+import pytest
+from sqlmodel import Session
+
+BOT_ID = str(uuid4())
+
+
+@pytest.fixture
+def transfer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SHARED_STATE_URL", f"sqlite:///{tmp_path / 'state.db'}")
+    import app.shared_state
+
+    importlib.reload(app.shared_state)
+    from app import bot_transfer, vectors
+
+    monkeypatch.setattr(vectors, "_client", chromadb.PersistentClient(path=str(tmp_path / "chroma")))
+    return bot_transfer
+
+
+def create_bot(shared_state, vectors, metadatas):
+    chatbot_dir = f"chatbots/{BOT_ID}"
+    os.makedirs(chatbot_dir)
+    with open(os.path.join(chatbot_dir, "source.txt"), "w", encoding="utf-8") as f:
+        f.write("source text")
+    shared_state.register_bot(BOT_ID, {"id": BOT_ID, "name": "n", "index_file": f"{chatbot_dir}/source.txt"})
+    vectors.get_or_create_collection(BOT_ID).add(
+        ids=[f"c{i}" for i in range(len(metadatas))],
+        embeddings=[[float(i), 1.0] for i in range(len(metadatas))],
+        documents=[f"chunk {i}" for i in range(len(metadatas))],
+        metadatas=metadatas,
+    )
+
+
+def forget_bot(shared_state, vectors):
+    # Simulates importing on a node that has never seen the bot
+    vectors.get_client().delete_collection(vectors.collection_name(BOT_ID))
+    shutil.rmtree("chatbots")
+    with Session(shared_state.engine) as session:
+        session.delete(session.get(shared_state.BotRegistry, BOT_ID))
+        session.commit()
+    shared_state._drop(BOT_ID)
+
+
+def test_round_trip_keeps_vectors_and_per_chunk_metadata(transfer):
+    from app import shared_state, vectors
+
+    create_bot(shared_state, vectors, [{"s": "1"}, None, {"s": "3"}])
+    lines = list(transfer.export_records(BOT_ID))
+    forget_bot(shared_state, vectors)
+
+    report = transfer.import_records(lines)
+
+    assert report["rows"]["chunk"] == 3
+    stored = vectors.find_collection(BOT_ID).get(include=["metadatas", "embeddings"])
+    by_id = dict(zip(stored["ids"], stored["metadatas"]))
+    assert by_id == {"c0": {"s": "1"}, "c1": None, "c2": {"s": "3"}}
+    assert shared_state.get_bot(BOT_ID)["ingestion_status"] == "ready"
+    with open(f"chatbots/{BOT_ID}/source.txt", encoding="utf-8") as f:
+        assert f.read() == "source text"
+
+
+@pytest.mark.parametrize("line", [
+    "[]",
+    '{"type": "bot"}',
+    '{"data": {}}',
+    '{"type": "bot", "data": {}}',
+    '{"type": "bot", "data": {"id": "../../tmp/escape"}}',
+    '{"type": "bot", "data": {"id": 7}}',
+    "not json",
+])
+def test_malformed_records_are_rejected(transfer, line):
+    from app import shared_state
+
+    with pytest.raises(transfer.TransferError) as error:
+        transfer.import_records([line])
+
+    assert error.value.status_code == 400
+    assert not os.path.exists("chatbots")
+    assert shared_state.list_bots() == []
+
+
+def test_export_refuses_bot_without_vectors_or_source(transfer):
+    from app import shared_state, vectors
+
+    shared_state.register_bot(BOT_ID, {"id": BOT_ID, "name": "legacy"})
+
+    with pytest.raises(transfer.TransferError) as error:
+        transfer.export_records(BOT_ID)
+
+    assert error.value.status_code == 409
+    assert vectors.find_collection(BOT_ID) is None
+
+
+def test_export_embeds_legacy_bot_once(transfer, monkeypatch):
+    from app import shared_state, vectors
+
+    create_bot(shared_state, vectors, [{"s": "1"}])
+    vectors.get_client().delete_collection(vectors.collection_name(BOT_ID))
+    embedded = []
+
+    def fake_index_source(chatbot_id, source_path, embedding=None):
+        embedded.append(source_path)
+        vectors.get_or_create_collection(chatbot_id).add(ids=["x"], embeddings=[[1.0, 2.0]], documents=["x"])
+
+    monkeypatch.setattr(vectors, "index_source", fake_index_source)
+    records = [json.loads(line) for line in transfer.export_records(BOT_ID)]
+    transfer.export_records(BOT_ID)
+
+    assert len(embedded) == 1
+    assert [r["id"] for r in records if r["type"] == "chunk"] == ["x"]
+
+
+def bot_line():
+    return json.dumps({"type": "bot", "data": {"id": BOT_ID, "name": "n"}})
+
+
+def chunk_line(chunk_id, embedding):
+    return json.dumps({"type": "chunk", "id": chunk_id, "text": "t", "embedding": embedding})
+
+
+@pytest.mark.parametrize("chunks", [
+    [chunk_line("a", [1.0, 2.0]), chunk_line("a", [3.0, 4.0])],
+    [chunk_line("a", [1.0, "x"])],
+    [chunk_line("a", [])],
+    [chunk_line("a", [1.0, 2.0]), chunk_line("b", [1.0, 2.0, 3.0])],
+])
+def test_malformed_chunks_are_rejected(transfer, chunks):
+    from app import shared_state
+
+    with pytest.raises(transfer.TransferError) as error:
+        transfer.import_records([bot_line(), *chunks])
+
+    assert error.value.status_code == 400
+    assert shared_state.get_bot(BOT_ID)["ingestion_status"] == "failed"
+
+
+def test_conversations_rejected_before_anything_is_written(transfer):
+    from app import vectors
+
+    line = json.dumps({"type": "bot", "data": {"id": BOT_ID}, "conversations": True})
+    with pytest.raises(transfer.TransferError) as error:
+        transfer.import_records([line, chunk_line("a", [1.0, 2.0])])
+
+    assert error.value.status_code == 501
+    assert not os.path.exists("chatbots")
+    assert vectors.find_collection(BOT_ID) is None
@@ -0,0 +1,95 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from app import rerank
+
+
+class StubModel:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.calls += 1
+        # Score each chunk by the number it carries, so ordering is predictable
+        return [float(text.split()[-1]) if text.startswith("chunk") else 0.0 for _, text in pairs]
+
+
+def make_docs(*scores):
+    return [SimpleNamespace(page_content=f"chunk {score}") for score in scores]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    stub = StubModel()
+    monkeypatch.setattr(rerank, "_model", stub)
+    monkeypatch.setattr(rerank, "_ms_per_pair", None)
+    monkeypatch.setattr(rerank, "_skipped", 0)
+    return stub
+
+
+def test_keeps_top_k_by_score(model):
+    docs = make_docs(1, 5, 3, 4, 2)
+    kept, reranked = rerank.rerank("q", docs, top_k=3, max_ms=1000)
+    assert reranked
+    assert [doc.page_content for doc in kept] == ["chunk 5", "chunk 4", "chunk 3"]
+    assert model.calls == 1
+    assert rerank._ms_per_pair is not None
+
+
+def test_few_candidates_are_returned_unchanged(model):
+    docs = make_docs(1, 2)
+    kept, reranked = rerank.rerank("q", docs, top_k=3, max_ms=1000)
+    assert kept == docs
+    assert not reranked
+    assert model.calls == 0
+
+
+def test_skips_when_estimate_exceeds_budget_then_remeasures(model, monkeypatch):
+    monkeypatch.setattr(rerank, "_ms_per_pair", 1000.0)
+    monkeypatch.setattr(rerank, "RERANK_REMEASURE_EVERY", 3)
+    docs = make_docs(1, 5, 3, 4)
+
+    for _ in range(2):
+        kept, reranked = rerank.rerank("q", docs, top_k=2, max_ms=50)
+        assert not reranked
+        assert kept == docs[:2]
+    assert model.calls == 0
+
+    kept, reranked = rerank.rerank("q", docs, top_k=2, max_ms=50)
+    assert reranked
+    assert model.calls == 1
+    assert rerank._ms_per_pair < 1000.0
+
+
+def test_falls_back_while_model_loads(monkeypatch):
+    started = []
+    monkeypatch.setattr(rerank, "_model", None)
+    monkeypatch.setattr(rerank, "preload", lambda: started.append(True))
+    docs = make_docs(1, 5, 3, 4)
+    kept, reranked = rerank.rerank("q", docs, top_k=2, max_ms=1000)
+    assert kept == docs[:2]
+    assert not reranked
+    assert started == [True]
+
+
+def test_falls_back_when_lock_wait_exceeds_budget(model):
+    docs = make_docs(1, 5, 3, 4)
+    with rerank._predict_lock:
+        kept, reranked = rerank.rerank("q", docs, top_k=2, max_ms=10)
+    assert kept == docs[:2]
+    assert not reranked
+    assert model.calls == 0
+
+
+def test_model_load_seeds_latency_estimate(monkeypatch):
+    monkeypatch.setitem(sys.modules, "torch", SimpleNamespace(set_num_threads=lambda n: None))
+    monkeypatch.setitem(sys.modules, "sentence_transformers", SimpleNamespace(CrossEncoder=lambda *a, **k: StubModel()))
+    monkeypatch.setattr(rerank, "_model", None)
+    monkeypatch.setattr(rerank, "_ms_per_pair", None)
+
+    model = rerank.get_cross_encoder()
+
+    assert model.calls == 2
+    assert rerank._ms_per_pair is not None
@@ -0,0 +1,117 @@
+import importlib
+import multiprocessing
+import time
+from uuid import uuid4
+
+import pytest
+
+
+@pytest.fixture
+def shared_state(tmp_path, monkeypatch):
+    # Spawned workers inherit this environment, so they share the tmp database
+    monkeypatch.setenv("SHARED_STATE_URL", f"sqlite:///{tmp_path / 'state.db'}")
+    monkeypatch.setenv("SHARED_STATE_POLL_SECONDS", "0.1")
+    import app.shared_state
+
+    return importlib.reload(app.shared_state)
+
+
+def _worker(bot_id, ready, results):
+    from app import shared_state
+
+    shared_state.start_listener()
+    results.put(shared_state.get_bot(bot_id)["version"])
+    ready.set()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        if shared_state.get_bot(bot_id)["version"] > 1:
+            results.put(shared_state.get_bot(bot_id)["version"])
+            return
+        time.sleep(0.05)
+    results.put(None)
+
+
+def test_workers_see_updates_from_another_process(shared_state):
+    bot_id = str(uuid4())
+    shared_state.register_bot(bot_id, {"id": bot_id, "name": "before"})
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    workers = []
+    for _ in range(3):
+        ready = ctx.Event()
+        process = ctx.Process(target=_worker, args=(bot_id, ready, results))
+        process.start()
+        assert ready.wait(30)
+        workers.append(process)
+
+    shared_state.register_bot(bot_id, {"id": bot_id, "name": "after"})
+    for process in workers:
+        process.join(15)
+
+    seen = [results.get(timeout=5) for _ in range(2 * len(workers))]
+    assert seen.count(1) == len(workers)
+    assert seen.count(2) == len(workers)
+
+
+def test_version_bump_prunes_cached_responses(shared_state):
+    from sqlmodel import Session, select
+
+    bot_id = str(uuid4())
+    shared_state.register_bot(bot_id, {"id": bot_id})
+    shared_state.put_cached_response(bot_id, "q", "a")
+    assert shared_state.get_cached_response(bot_id, "q") == "a"
+
+    shared_state.register_bot(bot_id, {"id": bot_id, "name": "updated"})
+    assert shared_state.get_cached_response(bot_id, "q") is None
+    with Session(shared_state.engine) as session:
+        assert session.exec(select(shared_state.ResponseCacheEntry)).all() == []
+
+
+def test_local_response_cache_is_bounded(shared_state, monkeypatch):
+    monkeypatch.setattr(shared_state, "RESPONSE_CACHE_LOCAL_SIZE", 2)
+    bot_id = str(uuid4())
+    shared_state.register_bot(bot_id, {"id": bot_id})
+    for question in ("a", "b", "c"):
+        shared_state.put_cached_response(bot_id, question, question.upper())
+
+    assert len(shared_state._responses) == 2
+    # Evicted locally, still served from the shared table
+    assert shared_state.get_cached_response(bot_id, "a") == "A"
+
+
+def test_read_racing_a_drop_is_not_cached(shared_state, monkeypatch):
+    bot_id = str(uuid4())
+    shared_state.register_bot(bot_id, {"id": bot_id})
+    to_dict = shared_state._to_dict
+
+    def drop_during_read(row):
+        # Another worker's invalidation lands between the SELECT and the cache write
+        shared_state._drop(bot_id)
+        return to_dict(row)
+
+    monkeypatch.setattr(shared_state, "_to_dict", drop_during_read)
+    shared_state.get_bot(bot_id)
+    assert bot_id not in shared_state._bots
+
+
+def test_events_committed_out_of_id_order_are_applied(shared_state):
+    from sqlmodel import Session
+
+    first, second = str(uuid4()), str(uuid4())
+    for bot_id in (first, second):
+        shared_state.register_bot(bot_id, {"id": bot_id})
+
+    with Session(shared_state.engine) as session:
+        session.add(shared_state.InvalidationEvent(id=1000, bot_id=second))
+        session.commit()
+    shared_state._apply_events()
+    shared_state.get_bot(first)
+    assert first in shared_state._bots
+
+    # A lower id that commits after a higher one has already been applied
+    with Session(shared_state.engine) as session:
+        session.add(shared_state.InvalidationEvent(id=500, bot_id=first))
+        session.commit()
+    shared_state._apply_events()
+    assert first not in shared_state._bots